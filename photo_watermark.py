@@ -9,10 +9,16 @@ A command-line tool to add watermark with EXIF shooting time to photos.
 """
 
 import argparse
+import concurrent.futures
+import functools
+import importlib.util
+import json
+import math
+import multiprocessing
 import os
+import shutil
 import sys
-from PIL import Image, ImageDraw, ImageFont
-import piexif
+from PIL import ExifTags, Image, ImageDraw, ImageFont, features
 from datetime import datetime
 
 
@@ -27,29 +33,53 @@ def get_exif_datetime(image_path):
         str: Date time string in format 'YYYY-MM-DD HH:MM:SS' or None if not found
     """
     try:
-        exif_dict = piexif.load(image_path)
-        
-        # Try to get shooting time from EXIF
-        if "Exif" in exif_dict:
-            if piexif.ExifIFD.DateTimeOriginal in exif_dict["Exif"]:
-                return exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal].decode("utf-8")
-            elif piexif.ExifIFD.DateTimeDigitized in exif_dict["Exif"]:
-                return exif_dict["Exif"][piexif.ExifIFD.DateTimeDigitized].decode("utf-8")
-        
-        if "0th" in exif_dict:
-            if piexif.ImageIFD.DateTime in exif_dict["0th"]:
-                return exif_dict["0th"][piexif.ImageIFD.DateTime].decode("utf-8")
-                
-        return None
+        # Pillow only parses the header segments here, not the pixel data
+        with Image.open(image_path) as image:
+            return _exif_datetime_from_pil(image)
     except Exception as e:
         print(f"Error reading EXIF data from {image_path}: {e}")
         return None
 
 
+def _exif_datetime_from_pil(image):
+    """
+    Extract shooting time from the EXIF data of an opened image.
+    
+    Args:
+        image (Image.Image): Opened PIL image
+        
+    Returns:
+        str: EXIF date time string or None if not found
+    """
+    # JPEG keeps EXIF in an APP1 segment before the image data, which Pillow
+    # has already read; PNG may place its eXIf chunk after the image data, so
+    # Pillow's full load in getexif() is needed to find it
+    if image.format == "JPEG" and "exif" not in image.info:
+        return None
+    
+    exif = image.getexif()
+    
+    # Try to get shooting time from EXIF
+    exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+    if ExifTags.Base.DateTimeOriginal in exif_ifd:
+        return exif_ifd[ExifTags.Base.DateTimeOriginal]
+    elif ExifTags.Base.DateTimeDigitized in exif_ifd:
+        return exif_ifd[ExifTags.Base.DateTimeDigitized]
+    
+    if ExifTags.Base.DateTime in exif:
+        return exif[ExifTags.Base.DateTime]
+        
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
 def format_datetime(datetime_str, format_str):
     """
     Format datetime string according to specified format.
     
+    Results are cached, since photos from the same burst often share
+    identical EXIF timestamps.
+    
     Args:
         datetime_str (str): Original datetime string from EXIF
         format_str (str): Target format string
@@ -62,13 +92,66 @@ def format_datetime(datetime_str, format_str):
     
     try:
         # Parse the EXIF datetime string (typically in format "YYYY:MM:DD HH:MM:SS")
-        dt = datetime.strptime(datetime_str, "%Y:%m:%d %H:%M:%S")
+        dt = _parse_exif_datetime(datetime_str)
         return dt.strftime(format_str)
     except ValueError:
         # If parsing fails, return the original string
         return datetime_str
 
 
+def _parse_exif_datetime(datetime_str):
+    """
+    Parse an EXIF datetime string of the form "YYYY:MM:DD HH:MM:SS".
+    
+    EXIF datetimes have a fixed layout, so slicing is much faster than
+    strptime; strptime is only used for strings that do not match it.
+    
+    Args:
+        datetime_str (str): Datetime string from EXIF
+        
+    Returns:
+        datetime: Parsed datetime
+        
+    Raises:
+        ValueError: If the string cannot be parsed
+    """
+    s = datetime_str
+    if len(s) == 19 and s[4] == s[7] == s[13] == s[16] == ":" and s[10] == " ":
+        try:
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                            int(s[11:13]), int(s[14:16]), int(s[17:19]))
+        except ValueError:
+            pass
+    return datetime.strptime(datetime_str, "%Y:%m:%d %H:%M:%S")
+
+
+# TrueType font used for the watermark text
+_FONT_PATH = "arial.ttf"
+
+# File extensions of images processed in a directory
+_IMAGE_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.tiff', '.tif'})
+
+# Sidecar file caching EXIF datetimes of a directory between runs
+EXIF_CACHE_FILENAME = ".photo_watermark_cache.json"
+
+# Image modes that an RGBA text overlay can be pasted into
+_OVERLAY_MODES = ("RGB", "RGBA", "L", "CMYK")
+
+# Text position functions keyed by position name, taking
+# (img_width, img_height, text_width, text_height, margin_x, margin_y)
+_POSITION_FNS = {
+    "top-left": lambda iw, ih, tw, th, mx, my: (mx, my),
+    "top-center": lambda iw, ih, tw, th, mx, my: (iw/2 - tw/2, my),
+    "top-right": lambda iw, ih, tw, th, mx, my: (iw - tw - mx, my),
+    "middle-left": lambda iw, ih, tw, th, mx, my: (mx, ih/2 - th/2),
+    "center": lambda iw, ih, tw, th, mx, my: (iw/2 - tw/2, ih/2 - th/2),
+    "middle-right": lambda iw, ih, tw, th, mx, my: (iw - tw - mx, ih/2 - th/2),
+    "bottom-left": lambda iw, ih, tw, th, mx, my: (mx, ih - th - my),
+    "bottom-center": lambda iw, ih, tw, th, mx, my: (iw/2 - tw/2, ih - th - my),
+    "bottom-right": lambda iw, ih, tw, th, mx, my: (iw - tw - mx, ih - th - my)
+}
+
+
 def get_text_position(image_size, text_size, position):
     """
     Calculate the position to place text watermark based on image size and desired position.
@@ -88,20 +171,131 @@ def get_text_position(image_size, text_size, position):
     margin_x = img_width * 0.05
     margin_y = img_height * 0.05
     
-    # Calculate positions based on keywords
-    positions = {
-        "top-left": (margin_x, margin_y),
-        "top-center": (img_width/2 - text_width/2, margin_y),
-        "top-right": (img_width - text_width - margin_x, margin_y),
-        "middle-left": (margin_x, img_height/2 - text_height/2),
-        "center": (img_width/2 - text_width/2, img_height/2 - text_height/2),
-        "middle-right": (img_width - text_width - margin_x, img_height/2 - text_height/2),
-        "bottom-left": (margin_x, img_height - text_height - margin_y),
-        "bottom-center": (img_width/2 - text_width/2, img_height - text_height - margin_y),
-        "bottom-right": (img_width - text_width - margin_x, img_height - text_height - margin_y)
-    }
+    position_fn = _POSITION_FNS.get(position, _POSITION_FNS["bottom-right"])  # Default to bottom-right
+    return position_fn(img_width, img_height, text_width, text_height, margin_x, margin_y)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_font(font_path, font_size):
+    """
+    Load a TrueType font, falling back to the default font if not available.
+    
+    Results are cached so the font file is parsed only once per run.
+    
+    Args:
+        font_path (str): Path or name of the TrueType font
+        font_size (int): Font size
+        
+    Returns:
+        ImageFont: Loaded font
+    """
+    try:
+        return ImageFont.truetype(font_path, font_size)
+    except (OSError, ValueError):
+        # Missing font file, or a font size FreeType rejects
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=256)
+def _measure_text(watermark_text, font_size):
+    """
+    Measure watermark text for layout and drawing.
+    
+    The text is laid out by its advance width and line metrics, while its
+    ink bounding box sizes the overlay it is drawn on. Results are cached,
+    since photos from the same day or burst share the same watermark text.
     
-    return positions.get(position, positions["bottom-right"])  # Default to bottom-right
+    Args:
+        watermark_text (str): Text to use as watermark
+        font_size (int): Font size for the watermark
+        
+    Returns:
+        tuple: Layout (width, height) of the text and its ink bounding box
+    """
+    font = _get_font(_FONT_PATH, font_size)
+    text_bbox = font.getbbox(watermark_text)
+    if hasattr(font, "getmetrics"):
+        ascent, descent = font.getmetrics()
+        text_size = (math.ceil(font.getlength(watermark_text)), ascent + descent)
+    else:
+        # Bitmap fonts have no line metrics
+        text_size = tuple(text_bbox[2:])
+    return text_size, text_bbox
+
+
+def draw_watermark(image, watermark_text, font_size, font_color, position):
+    """
+    Draw watermark text onto an opened image in place.
+    
+    Args:
+        image (Image.Image): Opened PIL image
+        watermark_text (str): Text to use as watermark
+        font_size (int): Font size for the watermark
+        font_color (str): Color of the watermark text
+        position (str): Position of the watermark
+    """
+    # Get the (cached) watermark font
+    font = _get_font(_FONT_PATH, font_size)
+    
+    # Get (cached) text dimensions
+    (text_width, text_height), text_bbox = _measure_text(watermark_text, font_size)
+    
+    # Get text position
+    text_position = get_text_position(image.size, (text_width, text_height), position)
+    
+    if image.mode not in _OVERLAY_MODES:
+        # Palette and other special modes need Pillow to resolve the color
+        draw = ImageDraw.Draw(image)
+        draw.text(text_position, watermark_text, font=font, fill=font_color)
+        return
+    
+    # Draw the text on a transparent overlay and paste it, so only the pixels
+    # under the text are touched. The overlay covers both the layout box and
+    # the ink, which can overhang it (e.g. negative left side bearings)
+    left = min(text_bbox[0], 0)
+    top = min(text_bbox[1], 0)
+    right = max(text_bbox[2], text_width)
+    bottom = max(text_bbox[3], text_height)
+    overlay = Image.new("RGBA", (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(overlay).text((-left, -top), watermark_text, font=font, fill=font_color)
+    image.paste(overlay, (int(text_position[0]) + left, int(text_position[1]) + top), overlay)
+
+
+def save_image(image, output_path):
+    """
+    Save a watermarked image to output path.
+    
+    JPEG images are encoded in a single pass at a fixed quality, keeping
+    the chroma subsampling of the source image. EXIF data of the source
+    image is written back, since Pillow drops it on save otherwise.
+    
+    Args:
+        image (Image.Image): Image to save
+        output_path (str, os.PathLike or file object): Path or binary file
+            object to save the image to; file objects get the format of the
+            source image
+    """
+    save_kwargs = {}
+    exif_bytes = image.info.get("exif")
+    if exif_bytes:
+        save_kwargs["exif"] = exif_bytes
+    elif image.format == "TIFF":
+        # TIFF keeps EXIF tags in its own IFDs rather than as raw EXIF bytes
+        save_kwargs["exif"] = image.getexif()
+    
+    if image.format == "JPEG":
+        save_format = "JPEG"
+        save_kwargs.update(quality=90, optimize=False, subsampling="keep")
+    else:
+        save_format = None
+    
+    if not isinstance(output_path, (str, os.PathLike)):
+        # File objects have no extension to infer the format from
+        image.save(output_path, save_format or image.format, **save_kwargs)
+        return
+    
+    _write_output(output_path, lambda path: image.save(path, save_format, **save_kwargs))
+    print(f"Watermarked image saved to: {output_path}")
 
 
 def add_watermark_to_image(image_path, watermark_text, font_size, font_color, position, output_path):
@@ -114,46 +308,89 @@ def add_watermark_to_image(image_path, watermark_text, font_size, font_color, po
         font_size (int): Font size for the watermark
         font_color (str): Color of the watermark text
         position (str): Position of the watermark
-        output_path (str): Path to save the watermarked image
+        output_path (str, os.PathLike or file object): Path or binary file
+            object to save the watermarked image to
     """
     try:
-        # Open the image
-        image = Image.open(image_path)
-        
-        # Create a drawing context
-        draw = ImageDraw.Draw(image)
-        
-        # Try to use a better font, fallback to default if not available
-        try:
-            # Try to use a TrueType font
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            # Fallback to default font
-            font = ImageFont.load_default()
-        
-        # Get text dimensions
-        text_bbox = draw.textbbox((0, 0), watermark_text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        # Get text position
-        text_position = get_text_position(image.size, (text_width, text_height), position)
-        
-        # Add the watermark text to the image
-        draw.text(text_position, watermark_text, font=font, fill=font_color)
-        
-        # Save the watermarked image
-        image.save(output_path)
-        print(f"Watermarked image saved to: {output_path}")
+        with Image.open(image_path) as image:
+            draw_watermark(image, watermark_text, font_size, font_color, position)
+            
+            # Save the watermarked image
+            save_image(image, output_path)
         
     except Exception as e:
         print(f"Error adding watermark to {image_path}: {e}")
 
 
-def process_single_image(image_path, font_size, font_color, position, date_format, output_dir):
+def _write_output(output_path, write):
+    """
+    Write an output file with write(output_path).
+    
+    An existing output is removed first: outputs copied with --copy-missing
+    may be hard links to the source image, so writing into them in place
+    would modify the source too. The output directory is created here, on
+    the first write, so skipped images leave no empty directory behind.
+    
+    Args:
+        output_path (str or os.PathLike): Path of the output file
+        write (callable): Function writing the output to the given path
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.isdir(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    elif os.path.lexists(output_path):
+        os.remove(output_path)
+    write(output_path)
+
+
+def _link_or_copy(image_path, output_path):
+    """
+    Hard-link an image to output path, copying it if linking is not possible.
+    
+    Args:
+        image_path (str): Path to the input image
+        output_path (str): Path of the output file
+    """
+    try:
+        os.link(image_path, output_path)
+    except OSError:
+        # Cross-device or no hard link support
+        shutil.copyfile(image_path, output_path)
+
+
+def skip_image(image_path, output_dir, copy_missing):
+    """
+    Handle an image without EXIF DateTime information.
+    
+    The image is either skipped or, if copy_missing is set, placed in the
+    output directory unchanged. A hard link is used when possible, so the
+    image is neither decoded nor re-encoded.
+    
+    Args:
+        image_path (str): Path to the input image
+        output_dir (str): Directory to place the image in
+        copy_missing (bool): Copy the image to the output directory
+    """
+    if not copy_missing:
+        print(f"Skipping {image_path}: No EXIF DateTime information found")
+        return
+    
+    output_path = os.path.join(output_dir, os.path.basename(image_path))
+    try:
+        _write_output(output_path, functools.partial(_link_or_copy, image_path))
+        print(f"Copied {image_path} without watermark (no EXIF DateTime) to: {output_path}")
+    except OSError as e:
+        print(f"Error copying {image_path}: {e}")
+
+
+def process_single_image(image_path, font_size, font_color, position, date_format, output_dir,
+                         exif_datetime=None, copy_missing=False):
     """
     Process a single image file - add watermark and save to output directory.
     
+    The image is opened once and used for both reading the EXIF datetime
+    and drawing the watermark.
+    
     Args:
         image_path (str): Path to the input image
         font_size (int): Font size for the watermark
@@ -161,54 +398,280 @@ def process_single_image(image_path, font_size, font_color, position, date_forma
         position (str): Position of the watermark
         date_format (str): Date format string
         output_dir (str): Directory to save the watermarked image
+        exif_datetime (str): EXIF datetime already known for this image, if any
+        copy_missing (bool): Copy images without EXIF DateTime to the output directory unchanged
+        
+    Returns:
+        str: EXIF datetime string of the image ('' if it has none),
+        or None if the image could not be processed
     """
-    # Get EXIF datetime
-    datetime_str = get_exif_datetime(image_path)
-    if not datetime_str:
-        print(f"Skipping {image_path}: No EXIF DateTime information found")
-        return
+    try:
+        with Image.open(image_path) as image:
+            # Get EXIF datetime, unless it is already known
+            datetime_str = exif_datetime or _exif_datetime_from_pil(image)
+            if not datetime_str:
+                skip_image(image_path, output_dir, copy_missing)
+                return ""
+            
+            # Format datetime according to user preference
+            formatted_datetime = format_datetime(datetime_str, date_format)
+            
+            # Generate output file path
+            filename = os.path.basename(image_path)
+            output_path = os.path.join(output_dir, filename)
+            
+            # Add watermark to image and save it
+            draw_watermark(image, formatted_datetime, font_size, font_color, position)
+            save_image(image, output_path)
+            return datetime_str
+            
+    except Exception as e:
+        print(f"Error processing {image_path}: {e}")
+        return None
+
+
+def _exif_datetime_from_vips(image):
+    """
+    Extract shooting time from the EXIF data of an opened pyvips image.
     
-    # Format datetime according to user preference
-    formatted_datetime = format_datetime(datetime_str, date_format)
+    Args:
+        image (pyvips.Image): Opened pyvips image
+        
+    Returns:
+        str: EXIF date time string or None if not found
+    """
+    # libvips exposes EXIF tags as "exif-ifd<N>-<Tag>" strings of the form
+    # "2023:05:20 15:30:45 (2023:05:20 15:30:45, ASCII, 20 components, 20 bytes)"
+    for field in ("exif-ifd2-DateTimeOriginal", "exif-ifd2-DateTimeDigitized", "exif-ifd0-DateTime"):
+        if image.get_typeof(field) != 0:
+            return image.get(field).split(" (", 1)[0]
+    return None
+
+
+def process_single_image_vips(image_path, font_size, font_color, position, date_format, output_dir,
+                              exif_datetime=None, copy_missing=False):
+    """
+    Process a single image file with libvips instead of Pillow.
     
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    libvips streams the image through the watermarking and encoding in
+    chunks, running without the GIL on its own worker threads.
     
-    # Generate output file path
-    filename = os.path.basename(image_path)
-    output_path = os.path.join(output_dir, filename)
+    Args:
+        image_path (str): Path to the input image
+        font_size (int): Font size for the watermark
+        font_color (str): Color of the watermark text
+        position (str): Position of the watermark
+        date_format (str): Date format string
+        output_dir (str): Directory to save the watermarked image
+        exif_datetime (str): EXIF datetime already known for this image, if any
+        copy_missing (bool): Copy images without EXIF DateTime to the output directory unchanged
+        
+    Returns:
+        str: EXIF datetime string of the image ('' if it has none),
+        or None if the image could not be processed
+    """
+    import pyvips
     
-    # Add watermark to image
-    add_watermark_to_image(image_path, formatted_datetime, font_size, font_color, position, output_path)
+    try:
+        image = pyvips.Image.new_from_file(image_path, access="sequential")
+        
+        # Get EXIF datetime, unless it is already known
+        datetime_str = exif_datetime or _exif_datetime_from_vips(image)
+        if not datetime_str:
+            skip_image(image_path, output_dir, copy_missing)
+            return ""
+        
+        # Format datetime according to user preference
+        formatted_datetime = format_datetime(datetime_str, date_format)
+        
+        # Generate output file path
+        filename = os.path.basename(image_path)
+        output_path = os.path.join(output_dir, filename)
+        
+        # Render the text as a mask (at 72 dpi points equal pixels) and place it
+        text = pyvips.Image.text(formatted_datetime, font=f"sans {font_size}", dpi=72)
+        text_position = get_text_position((image.width, image.height), (text.width, text.height), position)
+        mask = text.embed(int(text_position[0]), int(text_position[1]), image.width, image.height)
+        
+        # Blend the font color into the image through the text mask
+        mode = {1: "L", 2: "LA", 3: "RGB"}.get(image.bands, "CMYK" if image.interpretation == "cmyk" else "RGBA")
+        color = Image.new("RGB", (1, 1), font_color).convert(mode).getpixel((0, 0))
+        color = list(color) if isinstance(color, tuple) else [color]
+        image = mask.ifthenelse(color, image, blend=True)
+        
+        # Save the watermarked image, EXIF data is kept by libvips
+        save_kwargs = {"Q": 90} if os.path.splitext(filename)[1].lower() in (".jpg", ".jpeg") else {}
+        _write_output(output_path, lambda path: image.write_to_file(path, **save_kwargs))
+        print(f"Watermarked image saved to: {output_path}")
+        return datetime_str
+        
+    except Exception as e:
+        print(f"Error processing {image_path}: {e}")
+        return None
 
 
-def process_directory(directory_path, font_size, font_color, position, date_format):
+def process_directory(directory_path, font_size, font_color, position, date_format, jobs=None,
+                      copy_missing=False, backend="pil"):
     """
     Process all images in a directory.
     
+    EXIF datetimes found are cached in a sidecar file in the directory,
+    so later runs on unchanged images skip reading EXIF data.
+    
     Args:
         directory_path (str): Path to the directory containing images
         font_size (int): Font size for the watermark
         font_color (str): Color of the watermark text
         position (str): Position of the watermark
         date_format (str): Date format string
+        jobs (int): Number of worker processes (default: number of CPUs)
+        copy_missing (bool): Copy images without EXIF DateTime to the output directory unchanged
+        backend (str): Image processing backend, "pil" or "vips"
     """
     # Create watermark directory
     dir_name = os.path.basename(os.path.normpath(directory_path))
     output_dir = os.path.join(directory_path, f"{dir_name}_watermark")
     
-    # Process each image file
-    image_extensions = ('.jpg', '.jpeg', '.png', '.tiff', '.tif')
-    for file in os.listdir(directory_path):
-        if file.lower().endswith(image_extensions):
-            file_path = os.path.join(directory_path, file)
-            process_single_image(file_path, font_size, font_color, position, date_format, output_dir)
+    # Collect image files
+    with os.scandir(directory_path) as entries:
+        image_entries = [entry for entry in entries
+                         if entry.is_file()
+                         and os.path.splitext(entry.name)[1].lower() in _IMAGE_EXTS]
+    
+    # Look up EXIF datetimes of unchanged images from previous runs
+    cache_path = os.path.join(directory_path, EXIF_CACHE_FILENAME)
+    cache = _load_exif_cache(cache_path)
+    new_cache = {}
+    tasks = []
+    for entry in image_entries:
+        key = os.path.abspath(entry.path)
+        stat = entry.stat()
+        signature = [stat.st_mtime_ns, stat.st_size]
+        cached = cache.get(key)
+        datetime_str = cached[2] if cached and cached[:2] == signature else None
+        if datetime_str == "":
+            skip_image(entry.path, output_dir, copy_missing)
+            new_cache[key] = cached
+            continue
+        tasks.append((key, entry.path, signature, datetime_str))
+    
+    # Process images in parallel, one worker process per CPU by default
+    worker = functools.partial(
+        process_single_image_vips if backend == "vips" else process_single_image,
+        font_size=font_size,
+        font_color=font_color,
+        position=position,
+        date_format=date_format,
+        output_dir=output_dir,
+        copy_missing=copy_missing
+    )
+    max_workers = clamp_jobs(jobs)
+    if max_workers == 1 or len(tasks) <= 1:
+        # Nothing to overlap, so skip the cost of starting worker processes
+        results = [worker(path, exif_datetime=datetime_str) for _, path, _, datetime_str in tasks]
+    else:
+        # Load the font before forking, so workers inherit the parsed font
+        # instead of each parsing the font file again
+        mp_context = None
+        if sys.platform.startswith("linux"):
+            if backend == "pil":
+                _get_font(_FONT_PATH, font_size)
+            mp_context = multiprocessing.get_context("fork")
+        
+        # While one worker waits on disk, the others keep decoding and encoding,
+        # so reads are overlapped with CPU work without a separate I/O stage
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+            futures = [executor.submit(worker, path, exif_datetime=datetime_str)
+                       for _, path, _, datetime_str in tasks]
+            results = [future.result() for future in futures]
+    
+    # Remember EXIF datetimes for the next run
+    for (key, _, signature, _), result in zip(tasks, results):
+        if result is not None:
+            new_cache[key] = signature + [result]
+    if new_cache != cache:
+        _save_exif_cache(cache_path, new_cache)
+
+
+def _load_exif_cache(cache_path):
+    """
+    Load the EXIF datetime cache of a directory.
+    
+    Entries that are not [mtime_ns, size, datetime_str] lists, e.g. in a
+    hand-edited or corrupt cache file, are dropped and treated as cache
+    misses.
+    
+    Args:
+        cache_path (str): Path to the cache file
+        
+    Returns:
+        dict: Mapping of absolute image path to [mtime_ns, size, datetime_str]
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return {key: entry for key, entry in cache.items() if _is_valid_cache_entry(entry)}
 
 
-def parse_args():
+def _is_valid_cache_entry(entry):
+    """
+    Check that an EXIF cache entry has the form [mtime_ns, size, datetime_str].
+    
+    Args:
+        entry: Cache entry loaded from JSON
+        
+    Returns:
+        bool: True if the entry is well-formed
+    """
+    return (isinstance(entry, list) and len(entry) == 3
+            and isinstance(entry[0], int) and isinstance(entry[1], int)
+            and isinstance(entry[2], str))
+
+
+def _save_exif_cache(cache_path, cache):
+    """
+    Save the EXIF datetime cache of a directory, ignoring write errors.
+    
+    Args:
+        cache_path (str): Path to the cache file
+        cache (dict): Mapping of absolute image path to [mtime_ns, size, datetime_str]
+    """
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write EXIF cache {cache_path}: {e}")
+
+
+def clamp_jobs(jobs):
+    """
+    Clamp the requested number of worker processes to 1..cpu_count().
+    
+    Args:
+        jobs (int): Requested number of workers, or None for all CPUs
+        
+    Returns:
+        int: Number of worker processes to use
+    """
+    cpu_count = os.cpu_count() or 1
+    if jobs is None:
+        return cpu_count
+    return max(1, min(jobs, cpu_count))
+
+
+def parse_args(argv=None):
     """
     Parse command line arguments.
     
+    Args:
+        argv (list): Arguments to parse (default: sys.argv[1:])
+        
     Returns:
         argparse.Namespace: Parsed arguments
     """
@@ -243,11 +706,7 @@ Examples:
     
     parser.add_argument(
         "-p", "--position",
-        choices=[
-            "top-left", "top-center", "top-right",
-            "middle-left", "center", "middle-right",
-            "bottom-left", "bottom-center", "bottom-right"
-        ],
+        choices=_POSITION_FNS,
         default="bottom-right",
         help="Watermark position (default: bottom-right)"
     )
@@ -259,35 +718,104 @@ Examples:
         help="Date format (default: %%Y-%%m-%%d)"
     )
     
-    return parser.parse_args()
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes for directories (default: number of CPUs)"
+    )
+    
+    parser.add_argument(
+        "--copy-missing",
+        action="store_true",
+        help="Copy images without EXIF DateTime to the output directory unchanged"
+    )
+    
+    parser.add_argument(
+        "--backend",
+        choices=["pil", "vips"],
+        default="pil",
+        help="Image processing backend, vips requires pyvips (default: pil)"
+    )
+    
+    return parser.parse_args(argv)
 
 
-def main():
+def run(path, size=24, color="white", position="bottom-right", date_format="%Y-%m-%d",
+        jobs=None, copy_missing=False, backend="pil"):
     """
-    Main function to run the photo watermark tool.
+    Add watermarks to an image file or all images in a directory.
+    
+    This is the library entry point; main() parses the command line and calls it.
+    
+    Args:
+        path (str): Image file or directory path
+        size (int): Font size for the watermark
+        color (str): Color of the watermark text
+        position (str): Position of the watermark
+        date_format (str): Date format string
+        jobs (int): Number of worker processes for directories (default: number of CPUs)
+        copy_missing (bool): Copy images without EXIF DateTime to the output directory unchanged
+        backend (str): Image processing backend, "pil" or "vips" (requires pyvips)
+        
+    Raises:
+        ValueError: If the position or backend is unknown, the backend is not
+            installed, or the path does not exist or is neither a file nor a directory
     """
-    args = parse_args()
+    if position not in _POSITION_FNS:
+        raise ValueError(f"Unknown position '{position}'")
+    if backend not in ("pil", "vips"):
+        raise ValueError(f"Unknown backend '{backend}'")
+    if backend == "vips" and importlib.util.find_spec("pyvips") is None:
+        raise ValueError("The vips backend requires pyvips (pip install pyvips)")
     
     # Check if path exists
-    if not os.path.exists(args.path):
-        print(f"Error: Path '{args.path}' does not exist")
-        sys.exit(1)
+    if not os.path.exists(path):
+        raise ValueError(f"Path '{path}' does not exist")
     
     # If it's a file
-    if os.path.isfile(args.path):
+    if os.path.isfile(path):
         # Generate output directory - use the parent directory name
-        file_dir = os.path.dirname(os.path.abspath(args.path))
+        file_dir = os.path.dirname(os.path.abspath(path))
         dir_name = os.path.basename(file_dir)
         output_dir = os.path.join(file_dir, f"{dir_name}_watermark")
         
         # Process the single image
-        process_single_image(args.path, args.size, args.color, args.position, args.date_format, output_dir)
+        process_fn = process_single_image_vips if backend == "vips" else process_single_image
+        process_fn(path, size, color, position, date_format, output_dir, copy_missing=copy_missing)
     # If it's a directory
-    elif os.path.isdir(args.path):
+    elif os.path.isdir(path):
         # Process all images in the directory
-        process_directory(args.path, args.size, args.color, args.position, args.date_format)
+        process_directory(path, size, color, position, date_format, jobs, copy_missing, backend)
     else:
-        print(f"Error: '{args.path}' is neither a file nor a directory")
+        raise ValueError(f"'{path}' is neither a file nor a directory")
+
+
+def _warn_if_slow_jpeg():
+    """
+    Print a warning if Pillow was built without libjpeg-turbo.
+    
+    JPEG decoding and encoding dominate the run time, and libjpeg-turbo
+    (used by the official Pillow wheels and by Pillow-SIMD) is several
+    times faster than plain libjpeg.
+    """
+    if not features.check_feature("libjpeg_turbo"):
+        print("Warning: Pillow is not built with libjpeg-turbo, JPEG processing will be slow. "
+              "Consider installing pillow-simd.", file=sys.stderr)
+
+
+def main():
+    """
+    Main function to run the photo watermark tool.
+    """
+    args = parse_args()
+    _warn_if_slow_jpeg()
+    
+    try:
+        run(args.path, args.size, args.color, args.position, args.date_format,
+            args.jobs, args.copy_missing, args.backend)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
 
@@ -5,12 +5,21 @@
 Comprehensive tests for Photo Watermark Tool
 """
 
+import contextlib
+import json
 import os
+import pathlib
 import sys
+import importlib.util
+import io
+import math
 import unittest
-from PIL import Image
+from unittest import mock
+from PIL import Image, ImageDraw
 import tempfile
 import shutil
+import struct
+import zlib
 import piexif
 
 # Add the project root to the path so we can import photo_watermark
@@ -66,6 +75,25 @@ class TestPhotoWatermarkComprehensive(unittest.TestCase):
         result = photo_watermark.get_exif_datetime(self.test_image_no_exif)
         self.assertIsNone(result)
         
+    def test_get_exif_datetime_png_exif_after_image_data(self):
+        """Test EXIF datetime extraction from a PNG with eXIf after IDAT."""
+        image_path = os.path.join(self.test_dir, "png_source", "late_exif.png")
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        buffer = io.BytesIO()
+        Image.new('RGB', (80, 60), color='blue').save(buffer, "PNG")
+        png_data = buffer.getvalue()
+        
+        # Insert an eXIf chunk right before IEND, i.e. after the image data
+        exif_data = piexif.dump({"0th": {piexif.ImageIFD.DateTime: "2023:05:20 15:30:45"}})[6:]
+        chunk = (struct.pack(">I", len(exif_data)) + b"eXIf" + exif_data
+                 + struct.pack(">I", zlib.crc32(b"eXIf" + exif_data)))
+        iend = png_data.rindex(b"IEND") - 4
+        with open(image_path, "wb") as f:
+            f.write(png_data[:iend] + chunk + png_data[iend:])
+        
+        result = photo_watermark.get_exif_datetime(image_path)
+        self.assertEqual(result, "2023:05:20 15:30:45")
+        
     def test_format_datetime(self):
         """Test datetime formatting function."""
         # Test normal case
@@ -74,6 +102,14 @@ class TestPhotoWatermarkComprehensive(unittest.TestCase):
         result = photo_watermark.format_datetime(datetime_str, format_str)
         self.assertEqual(result, "2023-01-15")
         
+        # Test formatting with time fields
+        result = photo_watermark.format_datetime(datetime_str, "%Y-%m-%d %H:%M:%S")
+        self.assertEqual(result, "2023-01-15 14:30:25")
+        
+        # Test unparsable string is returned unchanged
+        result = photo_watermark.format_datetime("2023:13:45 99:99:99", format_str)
+        self.assertEqual(result, "2023:13:45 99:99:99")
+        
     def test_get_text_position_all_positions(self):
         """Test text position calculation for all positions."""
         image_size = (800, 600)
@@ -93,31 +129,70 @@ class TestPhotoWatermarkComprehensive(unittest.TestCase):
             self.assertGreaterEqual(result[0], 0)
             self.assertGreaterEqual(result[1], 0)
             
+    def test_draw_watermark_keeps_overhanging_ink(self):
+        """Test that glyph ink outside the advance box is not clipped."""
+        font = photo_watermark._get_font(photo_watermark._FONT_PATH, 24)
+        text = "/"
+        image = Image.new('RGB', (300, 200))
+        photo_watermark.draw_watermark(image, text, 24, "white", "center")
+        
+        # Draw the same text directly at the same position for reference
+        ascent, descent = font.getmetrics()
+        text_size = (math.ceil(font.getlength(text)), ascent + descent)
+        x, y = photo_watermark.get_text_position(image.size, text_size, "center")
+        expected = Image.new('RGB', (300, 200))
+        ImageDraw.Draw(expected).text((int(x), int(y)), text, font=font, fill="white")
+        
+        self.assertEqual(image.tobytes(), expected.tobytes())
+        
     def test_add_watermark_to_image(self):
         """Test adding watermark to an image."""
-        output_path = os.path.join(self.test_dir, "output_watermark.jpg")
+        output = io.BytesIO()
         
-        # Add watermark to image
+        # Add watermark to image, saving it in memory
         photo_watermark.add_watermark_to_image(
             image_path=self.test_image_no_exif,
             watermark_text="Test Watermark",
             font_size=24,
             font_color="white",
             position="bottom-right",
-            output_path=output_path
+            output_path=output
         )
         
-        # Check that output image was created
-        self.assertTrue(os.path.exists(output_path))
+        # Check that output image was written
+        self.assertGreater(output.tell(), 0)
         
         # Check that output image can be opened
+        output.seek(0)
         try:
-            output_img = Image.open(output_path)
-            self.assertIsNotNone(output_img)
+            output_img = Image.open(output)
+            self.assertEqual(output_img.format, "JPEG")
+            self.assertEqual(output_img.size, (800, 600))
             output_img.close()
         except Exception as e:
             self.fail(f"Output image could not be opened: {e}")
 
+    def test_add_watermark_to_image_pathlib_output(self):
+        """Test saving a watermarked image to a pathlib.Path."""
+        output_path = pathlib.Path(self.test_dir) / "pathlib_output" / "output_watermark.jpg"
+        output_path.parent.mkdir(exist_ok=True)
+        
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            photo_watermark.add_watermark_to_image(
+                image_path=self.test_image_no_exif,
+                watermark_text="Test Watermark",
+                font_size=24,
+                font_color="white",
+                position="bottom-right",
+                output_path=output_path
+            )
+        
+        # Check that output image was saved and reported
+        with Image.open(output_path) as output_img:
+            self.assertEqual(output_img.format, "JPEG")
+        self.assertIn(f"Watermarked image saved to: {output_path}", stdout.getvalue())
+
     def test_process_single_image_with_exif(self):
         """Test processing a single image that has EXIF data."""
         # Create output directory with correct naming convention
@@ -148,6 +223,256 @@ class TestPhotoWatermarkComprehensive(unittest.TestCase):
             output_img.close()
         except Exception as e:
             self.fail(f"Output image could not be opened: {e}")
+        
+        # Check that EXIF data was preserved
+        result = photo_watermark.get_exif_datetime(output_image_path)
+        self.assertEqual(result, "2023:05:20 15:30:45")
+        
+    def test_process_single_image_recreates_removed_output_directory(self):
+        """Test that a removed output directory is recreated on the next image."""
+        output_dir = os.path.join(self.test_dir, "removed_output")
+        process_args = dict(
+            image_path=self.test_image_with_exif,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            output_dir=output_dir
+        )
+        
+        photo_watermark.process_single_image(**process_args)
+        shutil.rmtree(output_dir)
+        photo_watermark.process_single_image(**process_args)
+        
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "test_with_exif.jpg")))
+            
+    def test_get_font_invalid_size_falls_back_to_default(self):
+        """Test that an invalid font size falls back to the default font."""
+        for font_size in (0, -5):
+            self.assertIsNotNone(photo_watermark._get_font("DejaVuSans.ttf", font_size))
+        
+    def test_process_single_image_tiff_keeps_exif(self):
+        """Test that EXIF data of a TIFF image is preserved."""
+        image_path = os.path.join(self.test_dir, "tiff_source", "test_with_exif.tif")
+        output_dir = os.path.join(self.test_dir, "tiff_output")
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        exif_bytes = piexif.dump({"0th": {piexif.ImageIFD.DateTime: "2023:05:20 15:30:45"}})
+        Image.new('RGB', (800, 600), color='green').save(image_path, exif=exif_bytes)
+        
+        photo_watermark.process_single_image(
+            image_path=image_path,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            output_dir=output_dir
+        )
+        
+        result = photo_watermark.get_exif_datetime(os.path.join(output_dir, "test_with_exif.tif"))
+        self.assertEqual(result, "2023:05:20 15:30:45")
+        
+    def test_process_single_image_copy_missing(self):
+        """Test copying an image without EXIF data when copy_missing is set."""
+        output_dir = os.path.join(self.test_dir, "copy_missing_output")
+        
+        photo_watermark.process_single_image(
+            image_path=self.test_image_no_exif,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            output_dir=output_dir,
+            copy_missing=True
+        )
+        
+        # The image should be copied unchanged
+        output_image_path = os.path.join(output_dir, "test_no_exif.jpg")
+        with open(self.test_image_no_exif, "rb") as f_in, open(output_image_path, "rb") as f_out:
+            self.assertEqual(f_in.read(), f_out.read())
+        
+    def test_watermark_does_not_modify_linked_source(self):
+        """Test that watermarking a copied-through image leaves the source intact."""
+        source_dir = os.path.join(self.test_dir, "linked_source")
+        output_dir = os.path.join(source_dir, "linked_source_watermark")
+        os.makedirs(source_dir, exist_ok=True)
+        source_path = os.path.join(source_dir, "photo.jpg")
+        shutil.copyfile(self.test_image_no_exif, source_path)
+        
+        # Copy the image through while it has no EXIF data
+        photo_watermark.process_single_image(
+            image_path=source_path,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            output_dir=output_dir,
+            copy_missing=True
+        )
+        
+        # Add EXIF data to the source in place and watermark it
+        exif_bytes = piexif.dump({"Exif": {piexif.ExifIFD.DateTimeOriginal: "2023:05:20 15:30:45"}})
+        piexif.insert(exif_bytes, source_path)
+        with open(source_path, "rb") as f:
+            source_data = f.read()
+        
+        photo_watermark.process_single_image(
+            image_path=source_path,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            output_dir=output_dir,
+            copy_missing=True
+        )
+        
+        # The source must be unchanged, and the output must differ from it
+        with open(source_path, "rb") as f:
+            self.assertEqual(f.read(), source_data)
+        with open(os.path.join(output_dir, "photo.jpg"), "rb") as f:
+            self.assertNotEqual(f.read(), source_data)
+        
+    @unittest.skipUnless(importlib.util.find_spec("pyvips"), "pyvips is not installed")
+    def test_process_single_image_vips(self):
+        """Test processing a single image with the vips backend."""
+        output_dir = os.path.join(self.test_dir, "vips_output")
+        
+        result = photo_watermark.process_single_image_vips(
+            image_path=self.test_image_with_exif,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            output_dir=output_dir
+        )
+        self.assertEqual(result, "2023:05:20 15:30:45")
+        
+        # Check that output image was created with EXIF data preserved
+        output_image_path = os.path.join(output_dir, "test_with_exif.jpg")
+        self.assertEqual(photo_watermark.get_exif_datetime(output_image_path), "2023:05:20 15:30:45")
+        
+    @unittest.skipUnless(importlib.util.find_spec("pyvips"), "pyvips is not installed")
+    def test_process_directory_vips_continues_after_error(self):
+        """Test that a failing image does not stop a vips directory run."""
+        directory = os.path.join(self.test_dir, "vips_batch")
+        output_dir = os.path.join(directory, "vips_batch_watermark")
+        os.makedirs(directory, exist_ok=True)
+        for name in ("a.jpg", "b.jpg"):
+            shutil.copyfile(self.test_image_with_exif, os.path.join(directory, name))
+        
+        # A directory in place of the output file makes writing a.jpg fail
+        os.makedirs(os.path.join(output_dir, "a.jpg"))
+        
+        photo_watermark.process_directory(
+            directory_path=directory,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            jobs=1,
+            backend="vips"
+        )
+        
+        self.assertTrue(os.path.isfile(os.path.join(output_dir, "b.jpg")))
+        
+    def test_process_directory(self):
+        """Test processing all images in a directory."""
+        dir_name = os.path.basename(os.path.normpath(self.test_dir))
+        output_dir = os.path.join(self.test_dir, f"{dir_name}_watermark")
+        
+        photo_watermark.process_directory(
+            directory_path=self.test_dir,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            jobs=2
+        )
+        
+        # Only the image with EXIF data should be watermarked
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "test_with_exif.jpg")))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, "test_no_exif.jpg")))
+        
+    def test_process_directory_exif_cache(self):
+        """Test that EXIF datetimes are cached between directory runs."""
+        process_args = dict(
+            directory_path=self.test_dir,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            jobs=1
+        )
+        photo_watermark.process_directory(**process_args)
+        
+        cache_path = os.path.join(self.test_dir, photo_watermark.EXIF_CACHE_FILENAME)
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        
+        self.assertEqual(cache[os.path.abspath(self.test_image_with_exif)][2], "2023:05:20 15:30:45")
+        self.assertEqual(cache[os.path.abspath(self.test_image_no_exif)][2], "")
+        
+        # The second run should take the EXIF datetimes from the cache
+        with mock.patch.object(photo_watermark, "_exif_datetime_from_pil") as exif_reader:
+            photo_watermark.process_directory(**process_args)
+        exif_reader.assert_not_called()
+        
+    def test_process_directory_corrupt_exif_cache(self):
+        """Test that malformed EXIF cache entries are treated as cache misses."""
+        cache_path = os.path.join(self.test_dir, photo_watermark.EXIF_CACHE_FILENAME)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({
+                os.path.abspath(self.test_image_with_exif): 5,
+                os.path.abspath(self.test_image_no_exif): [1, "2", None],
+            }, f)
+        
+        photo_watermark.process_directory(
+            directory_path=self.test_dir,
+            font_size=24,
+            font_color="white",
+            position="bottom-right",
+            date_format="%Y-%m-%d",
+            jobs=1
+        )
+        
+        # The malformed entries should have been replaced
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        self.assertEqual(cache[os.path.abspath(self.test_image_with_exif)][2], "2023:05:20 15:30:45")
+        self.assertEqual(cache[os.path.abspath(self.test_image_no_exif)][2], "")
+        
+    def test_clamp_jobs(self):
+        """Test clamping of the worker process count."""
+        cpu_count = os.cpu_count() or 1
+        self.assertEqual(photo_watermark.clamp_jobs(None), cpu_count)
+        self.assertEqual(photo_watermark.clamp_jobs(0), 1)
+        self.assertEqual(photo_watermark.clamp_jobs(cpu_count + 100), cpu_count)
+            
+    def test_run_single_file(self):
+        """Test the library entry point with a single file."""
+        parent_dir_name = os.path.basename(os.path.normpath(self.test_dir))
+        output_dir = os.path.join(self.test_dir, f"{parent_dir_name}_watermark")
+        
+        photo_watermark.run(self.test_image_with_exif, size=36, color="red", position="top-left")
+        
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "test_with_exif.jpg")))
+        
+    def test_run_single_file_no_exif(self):
+        """Test that skipping a single file leaves no output directory behind."""
+        image_dir = os.path.join(self.test_dir, "no_exif_source")
+        image_path = os.path.join(image_dir, "test_no_exif.jpg")
+        os.makedirs(image_dir, exist_ok=True)
+        shutil.copyfile(self.test_image_no_exif, image_path)
+        
+        photo_watermark.run(image_path)
+        
+        self.assertFalse(os.path.exists(os.path.join(image_dir, "no_exif_source_watermark")))
+        
+    def test_run_invalid_arguments(self):
+        """Test the library entry point with invalid arguments."""
+        with self.assertRaises(ValueError):
+            photo_watermark.run(os.path.join(self.test_dir, "missing.jpg"))
+        with self.assertRaises(ValueError):
+            photo_watermark.run(self.test_image_with_exif, position="nowhere")
             
     def test_main_function_single_file(self):
         """Test the main function with a single file."""